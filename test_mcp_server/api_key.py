@@ -1,18 +1,37 @@
 import argparse
+import os
 from mcp.server.fastmcp import FastMCP
 from starlette.applications import Starlette
 from mcp.server.sse import SseServerTransport
 from starlette.requests import Request
 from starlette.routing import Mount, Route
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from mcp.server import Server
 import logging
+import hmac
 import uvicorn
 
+# 优先使用 uvloop 事件循环和 httptools 解析器，未安装时回退到默认实现
+try:
+    import uvloop  # noqa: F401
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+    UVICORN_HTTP = "httptools"
+except ImportError:
+    UVICORN_HTTP = "h11"
+
 # 定义服务器名称
 MCP_SERVER_NAME = "math-mcp-sse"
 
+# 仅在设置 MCP_DEBUG=1 时启用 Starlette 调试模式
+DEBUG = os.environ.get("MCP_DEBUG") == "1"
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +39,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(MCP_SERVER_NAME)
 
+# 有效的 API 密钥，这里可以替换为实际的 API 密钥
+VALID_API_KEY = b"key1"
+
 # 初始化 FastMCP 实例
 mcp = FastMCP(MCP_SERVER_NAME)
 
@@ -52,29 +74,46 @@ def subtract(a: float, b: float):
     return a - b
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+# 需要校验 Authorization 的路径前缀，其余路径（如健康检查）直接放行
+PROTECTED_PATH_PREFIXES = ("/sse", "/messages")
+
+
+class AuthMiddleware:
     """
-    中间件，用于校验请求头中的 Authorization。
+    ASGI 中间件，用于校验请求头中的 Authorization。
     """
-    async def dispatch(self, request, call_next):
+    def __init__(self, app: ASGIApp, valid_api_key: bytes = VALID_API_KEY) -> None:
+        self.app = app
+        self.valid_api_key = valid_api_key
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(PROTECTED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
         # 从请求头中提取 Authorization
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse({"error": "Unauthorized"}, status_code=401)
+            response = JSONResponse({"error": "Unauthorized"}, status_code=401)
+            await response(scope, receive, send)
+            return
 
-        # 提取 token 并校验
-        token = auth_header.split("Bearer ")[1]
-        valid_api_key = "key1"# 这里可以替换为实际的 API 密钥
-        if token != valid_api_key:
-            return JSONResponse({"error": "Invalid API key"}, status_code=401)
+        # 提取 token 并校验（恒定时间比较）
+        token = auth_header[7:]
+        if not hmac.compare_digest(token.encode(), self.valid_api_key):
+            response = JSONResponse({"error": "Invalid API key"}, status_code=401)
+            await response(scope, receive, send)
+            return
 
         # 如果校验通过，继续处理请求
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 # 创建 Starlette 应用
 def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlette:
     """Create a Starlette application that can serve the provided mcp server with SSE."""
     sse = SseServerTransport("/messages/")
+    # 初始化选项对所有连接都相同，只构建一次
+    init_options = mcp_server.create_initialization_options()
 
     async def handle_sse(request: Request) -> None:
         async with sse.connect_sse(
@@ -85,7 +124,7 @@ def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlett
             await mcp_server.run(
                 read_stream,
                 write_stream,
-                mcp_server.create_initialization_options(),
+                init_options,
             )
 
     app = Starlette(
@@ -110,5 +149,12 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     # 创建并运行 Starlette 应用
-    starlette_app = create_starlette_app(mcp_server, debug=True)
-    uvicorn.run(starlette_app, host=args.host, port=args.port)
\ No newline at end of file
+    starlette_app = create_starlette_app(mcp_server, debug=DEBUG)
+    uvicorn.run(
+        starlette_app,
+        host=args.host,
+        port=args.port,
+        loop=UVICORN_LOOP,
+        http=UVICORN_HTTP,
+        log_level="warning",
+    )
\ No newline at end of file
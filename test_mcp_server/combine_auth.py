@@ -1,59 +1,93 @@
 import argparse
+import os
 from mcp.server.fastmcp import FastMCP
 from starlette.applications import Starlette
 from mcp.server.sse import SseServerTransport
 from starlette.requests import Request
 from starlette.routing import Mount, Route
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from mcp.server import Server
 import logging
 import uvicorn
 import contextvars
 
+# 优先使用 uvloop 事件循环和 httptools 解析器，未安装时回退到默认实现
+try:
+    import uvloop  # noqa: F401
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+    UVICORN_HTTP = "httptools"
+except ImportError:
+    UVICORN_HTTP = "h11"
+
 request_context = contextvars.ContextVar("request_context")
 
 # 定义 API Key 和权限映射
 API_KEY_PERMISSIONS = {
-    "key1": ["add", "subtract"],
-    "key2": ["add"],
-    "key3": ["subtract"],
+    "key1": frozenset({"add", "subtract"}),
+    "key2": frozenset({"add"}),
+    "key3": frozenset({"subtract"}),
 }
 
-def check_permissions( tool_name: str) -> bool:
-    auth_token = request_context.get().get("auth_token")
-    permissions = API_KEY_PERMISSIONS.get(auth_token, [])
+def check_permissions(tool_name: str) -> bool:
+    permissions = request_context.get(frozenset())
     if tool_name not in permissions:
         raise ValueError(f"Permission denied for tool: {tool_name}")
     return True
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+# 需要校验 Authorization 的路径前缀，其余路径（如健康检查）直接放行
+PROTECTED_PATH_PREFIXES = ("/sse", "/messages")
+
+
+class AuthMiddleware:
     """
-    中间件，用于校验请求头中的 Authorization。
+    ASGI 中间件，用于校验请求头中的 Authorization。
     """
-    async def dispatch(self, request, call_next):
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(PROTECTED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
         # 从请求头中提取 Authorization
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse({"error": "Unauthorized"}, status_code=401)
+            response = JSONResponse({"error": "Unauthorized"}, status_code=401)
+            await response(scope, receive, send)
+            return
 
         # 提取 token 并校验
-        token = auth_header.split("Bearer ")[1]
-
-        if token not in API_KEY_PERMISSIONS:
-            return JSONResponse({"error": "Invalid API key"}, status_code=401)
-
-        # 将请求上下文存储到全局变量中
-        request_context.set({"auth_token": token})
+        token = auth_header[7:]
+        permissions = API_KEY_PERMISSIONS.get(token)
+        if permissions is None:
+            response = JSONResponse({"error": "Invalid API key"}, status_code=401)
+            await response(scope, receive, send)
+            return
+
+        # 工具调用运行在 /sse 连接的任务中，只需在建立 SSE 连接时写入权限上下文；
+        # /messages/ 请求仅负责把消息转发给对应会话
+        if scope["path"].startswith("/sse"):
+            request_context.set(permissions)
 
         # 如果校验通过，继续处理请求
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
 # 定义服务器名称
 MCP_SERVER_NAME = "math-mcp-sse"
 
+# 仅在设置 MCP_DEBUG=1 时启用 Starlette 调试模式
+DEBUG = os.environ.get("MCP_DEBUG") == "1"
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -101,6 +135,8 @@ def subtract(a: float, b: float):
 def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlette:
     """Create a Starlette application that can serve the provided mcp server with SSE."""
     sse = SseServerTransport("/messages/")
+    # 初始化选项对所有连接都相同，只构建一次
+    init_options = mcp_server.create_initialization_options()
 
     async def handle_sse(request: Request) -> None:
         async with sse.connect_sse(
@@ -111,7 +147,7 @@ def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlett
             await mcp_server.run(
                 read_stream,
                 write_stream,
-                mcp_server.create_initialization_options(),
+                init_options,
             )
 
     app = Starlette(
@@ -136,5 +172,12 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     # 创建并运行 Starlette 应用
-    starlette_app = create_starlette_app(mcp_server, debug=True)
-    uvicorn.run(starlette_app, host=args.host, port=args.port)
\ No newline at end of file
+    starlette_app = create_starlette_app(mcp_server, debug=DEBUG)
+    uvicorn.run(
+        starlette_app,
+        host=args.host,
+        port=args.port,
+        loop=UVICORN_LOOP,
+        http=UVICORN_HTTP,
+        log_level="warning",
+    )
\ No newline at end of file
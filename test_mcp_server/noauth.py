@@ -1,22 +1,58 @@
 import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
 from mcp.server.fastmcp import FastMCP
 from starlette.applications import Starlette
 from mcp.server.sse import SseServerTransport
 from starlette.requests import Request
 from starlette.routing import Mount, Route
+from starlette.types import ASGIApp, Receive, Scope, Send
 from mcp.server import Server
 import logging
 import uvicorn
 
+# 优先使用 uvloop 事件循环和 httptools 解析器，未安装时回退到默认实现
+try:
+    import uvloop  # noqa: F401
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+    UVICORN_HTTP = "httptools"
+except ImportError:
+    UVICORN_HTTP = "h11"
+
 # 定义服务器名称
 MCP_SERVER_NAME = "math-mcp-sse"
 
-# 配置日志
+# 仅在设置 MCP_DEBUG=1 时启用 Starlette 调试模式
+DEBUG = os.environ.get("MCP_DEBUG") == "1"
+
+# 配置日志，默认仅输出 WARNING 及以上级别，可通过 MCP_LOG 环境变量调整
+# （级别名如 MCP_LOG=INFO，或数值如 MCP_LOG=20）；无法识别的取值回退到 WARNING
+log_level_name = (os.environ.get("MCP_LOG") or "WARNING").strip().upper()
+if log_level_name.isdigit():
+    log_level = int(log_level_name)
+else:
+    # getLevelName 对已注册的级别名返回数值，否则返回字符串（兼容 Python 3.10）
+    log_level = logging.getLevelName(log_level_name)
+    if not isinstance(log_level, int):
+        log_level = None
+LOG_LEVEL = logging.WARNING if log_level is None else log_level
+
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(MCP_SERVER_NAME)
+if log_level is None:
+    logger.warning("Unknown MCP_LOG value %r, falling back to WARNING", log_level_name)
 
 # 初始化 FastMCP 实例
 mcp = FastMCP(MCP_SERVER_NAME)
@@ -35,6 +71,23 @@ def add(a: float, b: float) -> float:
     """
     return a + b
 
+@mcp.tool()
+def add_batch(a: list[float], b: list[float]) -> dict[str, list[float]]:
+    """
+    Add two lists of numbers element-wise in a single call.
+
+    Parameters:
+    - a (list[float]): First numbers (required)
+    - b (list[float]): Second numbers, same length as a (required)
+
+    Returns:
+    - dict: {"results": [...]} where results[i] is a[i] + b[i]
+    """
+    if len(a) != len(b):
+        raise ValueError(f"Length mismatch: a has {len(a)} items, b has {len(b)}")
+    # 返回单个对象，FastMCP 会将其序列化为一个 JSON 内容块，而不是每个元素一个块
+    return {"results": [x + y for x, y in zip(a, b)]}
+
 # @mcp.tool()
 # def subtract(a: float, b: float) -> float:
 #     """
@@ -50,30 +103,114 @@ def add(a: float, b: float) -> float:
 #     return a - b
 
 # 创建 Starlette 应用
-def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlette:
-    """Create a Starlette application that can serve the provided mcp server with SSE."""
+def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> ASGIApp:
+    """Create an ASGI application that can serve the provided mcp server with SSE."""
     sse = SseServerTransport("/messages/")
+    # 初始化选项对所有连接都相同，只构建一次
+    init_options = mcp_server.create_initialization_options()
 
-    async def handle_sse(request: Request) -> None:
-        async with sse.connect_sse(
-                request.scope,
-                request.receive,
-                request._send,
-        ) as (read_stream, write_stream):
+    async def handle_sse(scope: Scope, receive: Receive, send: Send) -> None:
+        async with sse.connect_sse(scope, receive, send) as (read_stream, write_stream):
             await mcp_server.run(
                 read_stream,
                 write_stream,
-                mcp_server.create_initialization_options(),
+                init_options,
             )
 
-    return Starlette(
+    async def sse_endpoint(request: Request) -> None:
+        await handle_sse(request.scope, request.receive, request._send)
+
+    # 回退应用保留原有的 Starlette 路由规则：/sse 只接受 GET/HEAD（其他方法返回 405），
+    # /sse/、/messages 等路径按斜杠重定向，其余请求返回 404；同时处理 lifespan
+    fallback_app = Starlette(
         debug=debug,
         routes=[
-            Route("/sse", endpoint=handle_sse),
+            Route("/sse", endpoint=sse_endpoint),
             Mount("/messages/", app=sse.handle_post_message),
         ],
     )
 
+    # 启动时构建静态路由表：GET/HEAD /sse 精确匹配，/messages/ 前缀匹配，
+    # 命中时跳过 Starlette 路由直接处理，其余请求交给回退应用
+    route_table = {"/sse": handle_sse}
+    route_methods = ("GET", "HEAD")
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            path = scope["path"]
+            handler = route_table.get(path)
+            if handler is not None and scope["method"] not in route_methods:
+                handler = None
+            elif handler is None and path.startswith("/messages/"):
+                handler = sse.handle_post_message
+            if handler is not None:
+                await handler(scope, receive, send)
+                return
+        await fallback_app(scope, receive, send)
+
+    return app
+
+def run_worker(port: int, uvicorn_options: dict) -> None:
+    """Run one worker process serving its own port."""
+    uvicorn.run(create_starlette_app(mcp._mcp_server, debug=DEBUG), port=port, **uvicorn_options)
+
+# 停止时等待 worker 优雅退出的最长时间（秒），超时后强制结束
+WORKER_SHUTDOWN_TIMEOUT = 10
+
+def supervise_workers(processes: list[multiprocessing.Process]) -> int:
+    """
+    Start the worker processes and wait for them.
+
+    SIGTERM/SIGINT terminate every worker (a second signal kills them), and
+    any worker exiting on its own stops the rest. Returns the exit code.
+    """
+    remaining = list(processes)
+    stopping = False
+    deadline = None
+    exit_code = 0
+
+    def stop_workers(force: bool = False) -> None:
+        nonlocal stopping, deadline
+        stopping = True
+        if force:
+            deadline = None
+            for process in remaining:
+                process.kill()
+        elif deadline is None:
+            deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+            for process in remaining:
+                process.terminate()
+
+    def handle_signal(signum, frame) -> None:
+        # 第一次信号优雅停止所有 worker，重复收到信号时强制结束
+        stop_workers(force=stopping)
+
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    while remaining:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        ready = multiprocessing.connection.wait([p.sentinel for p in remaining], timeout)
+        if not ready:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning("Workers did not stop within %ss, killing them", WORKER_SHUTDOWN_TIMEOUT)
+                stop_workers(force=True)
+            continue
+        for process in [p for p in remaining if p.sentinel in ready]:
+            remaining.remove(process)
+            process.join()
+            if not stopping:
+                # worker 意外退出（如端口被占用），停止其余 worker 并以非零状态退出
+                logger.error(
+                    "Worker %s (pid %s) exited unexpectedly with code %s, stopping all workers",
+                    process.name, process.pid, process.exitcode,
+                )
+                exit_code = 1
+                stop_workers()
+    return exit_code
+
 if __name__ == "__main__":
     mcp_server = mcp._mcp_server
 
@@ -81,8 +218,43 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run MCP SSE-based server')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     parser.add_argument('--port', type=int, default=18081, help='Port to listen on')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='Number of worker processes, 0 for one per CPU core. '
+             'Worker i listens on PORT + i; SSE sessions live in a single worker, '
+             'so clients or a session-pinning load balancer must keep each session on one port',
+    )
     args = parser.parse_args()
+    if args.workers < 0:
+        parser.error('--workers must be >= 0')
+    workers = args.workers or os.cpu_count() or 1
 
-    # 创建并运行 Starlette 应用
-    starlette_app = create_starlette_app(mcp_server, debug=True)
-    uvicorn.run(starlette_app, host=args.host, port=args.port)
\ No newline at end of file
+    uvicorn_options = dict(
+        host=args.host,
+        loop=UVICORN_LOOP,
+        http=UVICORN_HTTP,
+        timeout_keep_alive=30,
+        limit_concurrency=1000,
+        # 加深监听队列，应对大量 SSE 客户端同时重连
+        backlog=4096,
+        # uvicorn 的 error/access 日志器单独配置，与 MCP_LOG 保持同一级别，
+        # 默认 WARNING 时不再为每个请求输出访问日志
+        log_level=LOG_LEVEL,
+    )
+
+    if workers > 1:
+        # SSE 会话保存在进程内，不能让多个 worker 共享同一个监听 socket；
+        # 每个 worker 监听独立端口 (port + i)，同一会话的 /sse 与 /messages/ 请求始终落在同一进程
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(args.port + i, uvicorn_options),
+                name=f"worker-{args.port + i}",
+            )
+            for i in range(workers)
+        ]
+        sys.exit(supervise_workers(processes))
+    else:
+        # 创建并运行 Starlette 应用
+        starlette_app = create_starlette_app(mcp_server, debug=DEBUG)
+        uvicorn.run(starlette_app, port=args.port, **uvicorn_options)
\ No newline at end of file